@@ -0,0 +1,76 @@
+"""
+Chunked image backup and restore throughput vs. worker count
+
+Backs up an image file with ImageCopier.backup_compressed for every
+available codec and worker count, then restores it, reporting MB/s and
+the compression ratio. The default image mixes text, random data and
+zeros; pass --image to use a real device image instead.
+
+Usage: python benchmarks/bench_compression.py [--size-mb N] [--image PATH] [--workers 1,2,4,8]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quickusbkit import ChunkCodec, ImageCopier
+
+MB = 1024 * 1024
+
+
+def make_image(path, size_mb):
+    """Thirds of log-like text, random data and zeros, interleaved in 8 MB stripes"""
+    text = b''.join(b"2026-10-17 12:00:%02d usb 2-1: new high-speed USB device number %d\n" % (i % 60, i)
+                    for i in range(200000))[:8 * MB]
+    with open(path, 'wb') as f:
+        for stripe in range(0, size_mb, 8):
+            length = min(8, size_mb - stripe) * MB
+            kind = stripe // 8 % 3
+            f.write(text[:length] if kind == 0 else os.urandom(length) if kind == 1 else bytes(length))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=512)
+    parser.add_argument('--image', help="Existing image (or device, read-only) to back up")
+    parser.add_argument('--workers', default=','.join(str(1 << i) for i in range(
+        (os.cpu_count() or 1).bit_length())))
+    parser.add_argument('--dir', help="Directory for temporary files")
+    args = parser.parse_args()
+    worker_counts = [int(count) for count in args.workers.split(',')]
+    
+    work = tempfile.mkdtemp(dir=args.dir)
+    try:
+        image = args.image
+        if not image:
+            image = os.path.join(work, 'source.img')
+            make_image(image, args.size_mb)
+        backup = os.path.join(work, 'backup.imgz')
+        restored = os.path.join(work, 'restored.img')
+        
+        print(f"{os.cpu_count()} CPUs, {image}")
+        print(f"{'codec':<6} {'workers':>7} {'backup MB/s':>12} {'restore MB/s':>13} {'ratio':>6}")
+        for codec in ChunkCodec.available() + ['none']:
+            for workers in worker_counts:
+                copier = ImageCopier(compression=codec, workers=workers)
+                start = time.perf_counter()
+                read, _ = copier.backup_compressed(image, backup)
+                backup_time = time.perf_counter() - start
+                
+                start = time.perf_counter()
+                ImageCopier(workers=workers).restore_compressed(backup, restored)
+                restore_time = time.perf_counter() - start
+                os.unlink(restored)
+                
+                print(f"{codec:<6} {workers:>7} {read / MB / backup_time:>12.0f} "
+                      f"{read / MB / restore_time:>13.0f} {read / max(1, os.path.getsize(backup)):>6.2f}")
+    finally:
+        shutil.rmtree(work)
+
+
+if __name__ == '__main__':
+    main()
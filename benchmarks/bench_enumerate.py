@@ -0,0 +1,57 @@
+"""
+Time enumerate_block_devices on synthetic sysfs trees
+
+Usage: python benchmarks/bench_enumerate.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+
+from quickusbkit import enumerate_block_devices
+from fake_sysfs import add_disk, enumerate_args, write_mountinfo
+
+
+def disk_name(index):
+    """sda, sdb, ..., sdz, sdaa, ..."""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('a') + remainder) + letters
+    return 'sd' + letters
+
+
+def build(root, count):
+    mounts = []
+    for index in range(count):
+        numbers = add_disk(root, disk_name(index), 8 + index // 16, index % 16 * 16, partitions=2)
+        mounts.append((numbers[1], root, 'vfat'))
+    write_mountinfo(root, mounts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    
+    print(f"{'disks':>6} {'entries':>8} {'per scan':>10} {'per disk':>10}")
+    for count in (1, 16, 128):
+        with tempfile.TemporaryDirectory() as root:
+            build(root, count)
+            arguments = enumerate_args(root)
+            entries = len(enumerate_block_devices(**arguments))
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                enumerate_block_devices(**arguments)
+            elapsed = (time.perf_counter() - start) / args.repeat
+        print(f"{count:>6} {entries:>8} {elapsed * 1000:>8.2f}ms {elapsed / count * 1e6:>8.0f}us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Compare ImageCopier.copy with dd on an image file
+
+The source image is half random data and half zeros, in 16 MB stripes.
+Page cache is dropped between runs when running as root.
+
+Usage: python benchmarks/bench_image_copy.py [--size-mb N] [--dir PATH]
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quickusbkit import ImageCopier
+
+MB = 1024 * 1024
+
+
+def make_image(path, size_mb):
+    with open(path, 'wb') as f:
+        for stripe in range(0, size_mb, 16):
+            length = min(16, size_mb - stripe) * MB
+            f.write(os.urandom(length) if stripe // 16 % 2 == 0 else bytes(length))
+
+
+def drop_caches():
+    os.sync()
+    try:
+        with open('/proc/sys/vm/drop_caches', 'w') as f:
+            f.write('3\n')
+    except OSError:
+        pass
+
+
+def digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(8 * MB), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def allocated_mb(path):
+    return os.stat(path).st_blocks * 512 / MB
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=1024)
+    parser.add_argument('--dir', help="Directory for the images (default: a temporary directory)")
+    args = parser.parse_args()
+    
+    work = tempfile.mkdtemp(dir=args.dir)
+    try:
+        source = os.path.join(work, 'source.img')
+        target = os.path.join(work, 'target.img')
+        make_image(source, args.size_mb)
+        expected = digest(source)
+        
+        runs = [
+            ('ImageCopier 8M x2', lambda: ImageCopier().copy(source, target)),
+            ('ImageCopier 1M x2', lambda: ImageCopier(buffer_size=MB).copy(source, target)),
+            ('ImageCopier 8M x4', lambda: ImageCopier(buffers=4).copy(source, target)),
+            ('ImageCopier no sparse', lambda: ImageCopier(sparse=False).copy(source, target)),
+        ]
+        if shutil.which('dd'):
+            for label, options in [('dd bs=4M', ['conv=fsync']),
+                                   ('dd bs=4M direct', ['iflag=direct', 'oflag=direct']),
+                                   ('dd bs=4M conv=sparse', ['conv=fsync,sparse'])]:
+                command = ['dd', f"if={source}", f"of={target}", 'bs=4M', 'status=none'] + options
+                runs.append((label, lambda command=command: subprocess.run(command, check=True)))
+        
+        print(f"{'method':<24} {'seconds':>8} {'MB/s':>8} {'allocated':>10} {'same':>5}")
+        for label, run in runs:
+            if os.path.exists(target):
+                os.unlink(target)
+            drop_caches()
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            print(f"{label:<24} {elapsed:>8.2f} {args.size_mb / elapsed:>8.1f} "
+                  f"{allocated_mb(target):>8.0f}MB {str(digest(target) == expected):>5}")
+    finally:
+        shutil.rmtree(work)
+
+
+if __name__ == '__main__':
+    main()
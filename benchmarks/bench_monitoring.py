@@ -0,0 +1,118 @@
+"""
+Time one monitoring tick of MonitoringTableModel.update_rows and
+QuickUSBKit.update_stats_tree at 50 and 200 devices
+
+Usage: python benchmarks/bench_monitoring.py [--ticks N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import types
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication, QTableView, QTreeWidget
+
+from quickusbkit import MonitoringTableModel, QuickUSBKit
+
+
+def table_rows(count, tick, rng):
+    """Rows as the monitoring tick builds them; rates change on about a quarter of the devices"""
+    rows = []
+    for index in range(count):
+        busy = rng.random() < 0.25
+        rows.append((f"/dev/sd{index}", [
+            f"/dev/sd{index}", f"{35 + (tick // 30 + index) % 5}°C", "PASSED", f"{index % 100}%",
+            f"{rng.uniform(0, 40):.1f}" if busy else "0.0",
+            f"{rng.uniform(0, 20):.1f}" if busy else "0.0",
+            f"{rng.randint(0, 900)}" if busy else "0",
+            f"{rng.uniform(0, 5):.2f} ms" if busy else "0.00 ms",
+            f"{rng.randint(0, 4)}" if busy else "0"]))
+    return rows
+
+
+def tree_details(rows):
+    return [(key, list(zip(MonitoringTableModel.HEADERS[1:], values[1:]))) for key, values in rows]
+
+
+def make_view(view_class):
+    view = view_class()
+    view.resize(1200, 800)
+    view.show()
+    return view
+
+
+def bench_table(count, ticks):
+    model = MonitoringTableModel()
+    view = make_view(QTableView)
+    view.setModel(model)
+    signals = []
+    model.dataChanged.connect(lambda *args: signals.append(1))
+    rng = random.Random(count)
+    model.update_rows(table_rows(count, 0, rng))
+    
+    changed = 0
+    start = time.perf_counter()
+    for tick in range(1, ticks + 1):
+        changed += model.update_rows(table_rows(count, tick, rng))
+        QApplication.processEvents()
+    elapsed = time.perf_counter() - start
+    return elapsed / ticks, len(signals) / ticks, changed / ticks
+
+
+def bench_table_reset(count, ticks):
+    """Baseline: rebuild the whole model on every tick"""
+    model = MonitoringTableModel()
+    view = make_view(QTableView)
+    view.setModel(model)
+    rng = random.Random(count)
+    start = time.perf_counter()
+    for tick in range(1, ticks + 1):
+        rows = table_rows(count, tick, rng)
+        model.beginResetModel()
+        model.keys = [key for key, _ in rows]
+        model.cells = [list(values) for _, values in rows]
+        model.endResetModel()
+        QApplication.processEvents()
+    return (time.perf_counter() - start) / ticks
+
+
+def bench_tree(count, ticks):
+    host = types.SimpleNamespace(stats_tree=make_view(QTreeWidget), stats_tree_items={})
+    host.stats_tree.setColumnCount(2)
+    signals = []
+    host.stats_tree.itemChanged.connect(lambda *args: signals.append(1))
+    rng = random.Random(count)
+    QuickUSBKit.update_stats_tree(host, tree_details(table_rows(count, 0, rng)))
+    signals.clear()
+    
+    start = time.perf_counter()
+    for tick in range(1, ticks + 1):
+        QuickUSBKit.update_stats_tree(host, tree_details(table_rows(count, tick, rng)))
+        QApplication.processEvents()
+    elapsed = time.perf_counter() - start
+    return elapsed / ticks, len(signals) / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=100)
+    args = parser.parse_args()
+    app = QApplication.instance() or QApplication(sys.argv)
+    
+    print(f"{'devices':>7} {'table/tick':>11} {'reset/tick':>11} {'dataChanged':>12} {'cells':>7} "
+          f"{'tree/tick':>10} {'itemChanged':>12}")
+    for count in (50, 200):
+        table_time, data_changed, cells = bench_table(count, args.ticks)
+        reset_time = bench_table_reset(count, args.ticks)
+        tree_time, item_changed = bench_tree(count, args.ticks)
+        print(f"{count:>7} {table_time * 1000:>9.2f}ms {reset_time * 1000:>9.2f}ms {data_changed:>12.1f} "
+              f"{cells:>7.1f} {tree_time * 1000:>8.2f}ms {item_changed:>12.1f}")
+    del app
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Back up and restore mostly-empty images with and without hole skipping
+
+A sparse image of --size-mb with --data-percent of random data in 4 MB
+extents is attached to a loop device (as root with losetup; an image
+file is used otherwise), backed up, and restored with each hole mode.
+dd is timed on the same image for reference.
+
+Usage: python benchmarks/bench_sparse.py [--size-mb N] [--data-percent P] [--dir PATH]
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from quickusbkit import ImageCopier
+
+MB = 1024 * 1024
+EXTENT = 4 * MB
+
+
+def make_image(path, size_mb, data_percent):
+    rng = random.Random(size_mb)
+    slots = size_mb * MB // EXTENT
+    with open(path, 'wb') as f:
+        f.truncate(size_mb * MB)
+        for slot in rng.sample(range(slots), max(1, slots * data_percent // 100)):
+            f.seek(slot * EXTENT)
+            f.write(os.urandom(EXTENT))
+
+
+def attach(path):
+    if os.geteuid() != 0 or not shutil.which('losetup'):
+        return None
+    result = subprocess.run(['losetup', '--find', '--show', path], capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def timed(run):
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=2048)
+    parser.add_argument('--data-percent', type=int, default=5)
+    parser.add_argument('--dir', help="Directory for the images (default: a temporary directory)")
+    args = parser.parse_args()
+    
+    work = tempfile.mkdtemp(dir=args.dir)
+    loops = []
+    try:
+        source_file = os.path.join(work, 'source.img')
+        target_file = os.path.join(work, 'target.img')
+        backup = os.path.join(work, 'backup.img')
+        make_image(source_file, args.size_mb, args.data_percent)
+        with open(target_file, 'wb') as f:
+            f.truncate(args.size_mb * MB)
+        
+        source = attach(source_file) or source_file
+        target = attach(target_file) or target_file
+        loops = [path for path in (source, target) if path.startswith('/dev/')]
+        print(f"{args.size_mb} MB image, {args.data_percent}% data, "
+              f"{'loop devices' if loops else 'image files'}: {source} -> {target}")
+        
+        def backup_with(sparse):
+            copier = ImageCopier(sparse=sparse)
+            copier.copy(source, backup)
+            return copier
+        
+        rows = []
+        for label, sparse in [('backup, holes skipped', True), ('backup, full read', False)]:
+            elapsed = timed(lambda: backup_with(sparse))
+            rows.append((label, elapsed, os.stat(backup).st_blocks * 512 / MB))
+        
+        backup_with(True)
+        for holes in ImageCopier.HOLE_MODES:
+            elapsed = timed(lambda: ImageCopier(holes=holes).copy(backup, target))
+            rows.append((f"restore, holes={holes}", elapsed, None))
+        elapsed = timed(lambda: ImageCopier(sparse=False).copy(backup, target))
+        rows.append(("restore, no hole skipping", elapsed, None))
+        
+        if shutil.which('dd'):
+            os.unlink(backup)
+            elapsed = timed(lambda: subprocess.run(['dd', f"if={source}", f"of={backup}", 'bs=4M',
+                                                    'conv=fsync,sparse', 'status=none'], check=True))
+            rows.append(("dd backup, conv=sparse", elapsed, os.stat(backup).st_blocks * 512 / MB))
+            elapsed = timed(lambda: subprocess.run(['dd', f"if={backup}", f"of={target}", 'bs=4M',
+                                                    'conv=fsync,notrunc', 'status=none'], check=True))
+            rows.append(("dd restore", elapsed, None))
+        
+        print(f"{'':<28} {'seconds':>8} {'MB/s':>8} {'image size':>11}")
+        for label, elapsed, allocated in rows:
+            size = f"{allocated:.0f}MB" if allocated is not None else ''
+            print(f"{label:<28} {elapsed:>8.2f} {args.size_mb / elapsed:>8.0f} {size:>11}")
+    finally:
+        for loop in loops:
+            subprocess.run(['losetup', '-d', loop])
+        shutil.rmtree(work)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Build /sys, /proc and udev database trees for enumerate_block_devices"""
+import os
+
+USB_HOST = 'devices/pci0000:00/0000:00:14.0/usb2'
+ATA_HOST = 'devices/pci0000:00/0000:00:17.0/ata1/host0/target0:0:0/0:0:0:0'
+
+
+def write(path, value):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(f"{value}\n")
+
+
+def add_disk(root, name, major, minor, usb=True, partitions=0, removable=True,
+             vendor='SanDisk', model='Cruzer Blade', sectors=30031872):
+    """
+    Add a disk with partitions numbered from 1 under root/sys
+    
+    Returns:
+        List of the "major:minor" numbers of the disk and its partitions
+    """
+    sys_root = os.path.join(root, 'sys')
+    if usb:
+        port = f"2-{minor // 16 + 1}"
+        parent = f"{USB_HOST}/{port}/{port}:1.0/host{minor}/target{minor}:0:0/{minor}:0:0:0"
+    else:
+        parent = ATA_HOST
+    disk_dir = os.path.join(sys_root, parent, 'block', name)
+    write(os.path.join(disk_dir, 'dev'), f"{major}:{minor}")
+    write(os.path.join(disk_dir, 'removable'), int(removable))
+    write(os.path.join(disk_dir, 'size'), sectors)
+    write(os.path.join(disk_dir, 'queue', 'rotational'), 0)
+    write(os.path.join(disk_dir, 'queue', 'logical_block_size'), 512)
+    write(os.path.join(disk_dir, 'queue', 'max_sectors_kb'), 240)
+    write(os.path.join(sys_root, parent, 'vendor'), vendor)
+    write(os.path.join(sys_root, parent, 'model'), model)
+    # block/<name> -> the device directory, device -> its SCSI parent
+    os.makedirs(os.path.join(sys_root, 'block'), exist_ok=True)
+    os.symlink(disk_dir, os.path.join(sys_root, 'block', name))
+    os.symlink(os.path.join(sys_root, parent), os.path.join(disk_dir, 'device'))
+    
+    numbers = [f"{major}:{minor}"]
+    for number in range(1, partitions + 1):
+        part_dir = os.path.join(disk_dir, f"{name}{number}")
+        write(os.path.join(part_dir, 'dev'), f"{major}:{minor + number}")
+        write(os.path.join(part_dir, 'partition'), number)
+        write(os.path.join(part_dir, 'size'), sectors // partitions)
+        numbers.append(f"{major}:{minor + number}")
+    return numbers
+
+
+def write_mountinfo(root, mounts):
+    """mounts: list of ("major:minor", mountpoint, fstype)"""
+    lines = [f"{20 + i} 1 {number} / {mountpoint.replace(' ', chr(92) + '040')} rw,nosuid - {fstype} "
+             f"/dev/x rw\n" for i, (number, mountpoint, fstype) in enumerate(mounts)]
+    path = os.path.join(root, 'proc', 'self', 'mountinfo')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.writelines(lines)
+
+
+def write_udev(root, number, **properties):
+    path = os.path.join(root, 'udev', f"b{number}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.writelines(f"E:{key}={value}\n" for key, value in properties.items())
+
+
+def enumerate_args(root):
+    return {'sys_root': os.path.join(root, 'sys'), 'proc_root': os.path.join(root, 'proc'),
+            'udev_root': os.path.join(root, 'udev')}
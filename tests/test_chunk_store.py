@@ -0,0 +1,78 @@
+import hashlib
+import os
+
+import pytest
+
+import quickusbkit
+from quickusbkit import ChunkStore, ImageCopier
+
+MB = 1024 * 1024
+
+
+def digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / 'stick.img'
+    path.write_bytes(os.urandom(3 * MB) + bytes(2 * MB) + os.urandom(MB))
+    return str(path)
+
+
+@pytest.fixture
+def synced(monkeypatch):
+    """Paths passed to os.fsync, resolved through /proc/self/fd"""
+    paths = []
+    fsync = os.fsync
+    
+    def recording_fsync(fd):
+        paths.append(os.readlink(f"/proc/self/fd/{fd}"))
+        fsync(fd)
+    
+    if not os.path.isdir('/proc/self/fd'):
+        pytest.skip("needs /proc/self/fd")
+    monkeypatch.setattr(quickusbkit.os, 'fsync', recording_fsync)
+    return paths
+
+
+def test_incremental_round_trip(tmp_path, image):
+    store = ChunkStore(str(tmp_path / 'store'))
+    try:
+        manifest, path, new_chunks = ImageCopier().backup_incremental(image, store)
+        assert len(new_chunks) == 4
+        # Nothing changed: the second backup adds no chunks
+        _, second, again = ImageCopier().backup_incremental(image, store)
+        assert again == {} and second != path
+        assert store.stats()['backups'] == 2
+    finally:
+        store.close()
+    
+    restored = str(tmp_path / 'restored.img')
+    ImageCopier().restore_manifest(path, restored)
+    assert digest(restored) == digest(image)
+
+
+def test_chunks_and_manifest_are_synced(tmp_path, image, synced):
+    root = str(tmp_path / 'store')
+    store = ChunkStore(root)
+    try:
+        manifest, path, new_chunks = ImageCopier().backup_incremental(image, store)
+    finally:
+        store.close()
+    
+    for chunk in new_chunks:
+        chunk_path = store.chunk_path(chunk)
+        # The temporary file is synced before it is renamed into place
+        assert f"{chunk_path}.tmp" in synced
+        assert os.path.dirname(chunk_path) in synced
+    assert os.path.join(root, 'chunks') in synced
+    assert f"{path}.tmp" in synced
+    manifest_sync = synced.index(os.path.join(root, 'manifests'))
+    assert manifest_sync > max(synced.index(f"{store.chunk_path(chunk)}.tmp") for chunk in new_chunks)
+    assert ChunkStore.load_manifest(path)['blocks'] == manifest['blocks']
+
+
+def test_fsync_directory_missing(tmp_path):
+    quickusbkit.fsync_directory(str(tmp_path / 'missing'))
@@ -0,0 +1,191 @@
+import hashlib
+import os
+import threading
+import time
+
+import pytest
+
+import quickusbkit
+from quickusbkit import (ChunkCodec, ImageCopier, OperationCancelled, USBKitError, ordered_parallel_map,
+                         read_used_image_header, COMPRESSED_IMAGE_MAGIC)
+
+MB = 1024 * 1024
+CODECS = ['zstd', 'gzip', 'xz', 'none']
+
+
+def digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def codec_available(name):
+    return name == 'none' or name in ChunkCodec.available()
+
+
+def leftover_threads():
+    return [thread.name for thread in threading.enumerate() if thread.name.startswith('usbkit-')]
+
+
+@pytest.fixture
+def image(tmp_path):
+    """Compressible text, random data, zeros and an unaligned tail, 1 MB chunks"""
+    path = str(tmp_path / 'stick.img')
+    text = b''.join(b"line %d of a fairly compressible file\n" % i for i in range(200000))
+    with open(path, 'wb') as f:
+        f.write(text[:6 * MB])
+        f.write(os.urandom(4 * MB))
+        f.write(bytes(6 * MB))
+        f.write(os.urandom(MB + 512))
+    return path
+
+
+@pytest.mark.parametrize('codec', CODECS)
+def test_round_trip(tmp_path, image, codec):
+    if not codec_available(codec):
+        pytest.skip(f"{codec} is not available")
+    backup = str(tmp_path / 'backup.imgz')
+    restored = str(tmp_path / 'restored.img')
+    copier = ImageCopier(buffer_size=MB, compression=codec, workers=3)
+    read, layout = copier.backup_compressed(image, backup)
+    assert read == os.path.getsize(image)
+    assert layout == 'full image'
+    assert copier.bytes_skipped >= 6 * MB
+    if codec != 'none':
+        assert copier.bytes_written < read - 10 * MB
+    
+    fd = os.open(backup, os.O_RDONLY)
+    try:
+        header, _ = read_used_image_header(fd, COMPRESSED_IMAGE_MAGIC)
+    finally:
+        os.close(fd)
+    assert header['codec'] == codec and header['chunk_size'] == MB and header['version'] == 2
+    
+    ImageCopier(workers=2).restore_compressed(backup, restored)
+    assert digest(restored) == digest(image)
+
+
+@pytest.mark.parametrize('workers, in_flight', [(1, 2), (4, 5), (8, 32)])
+def test_worker_counts_give_the_same_image(tmp_path, image, workers, in_flight):
+    reference = str(tmp_path / 'reference.imgz')
+    backup = str(tmp_path / 'backup.imgz')
+    codec = ChunkCodec.available()[0]
+    ImageCopier(buffer_size=MB, compression=codec, workers=1).backup_compressed(image, reference)
+    ImageCopier(buffer_size=MB, compression=codec, workers=workers, in_flight=in_flight).backup_compressed(
+        image, backup)
+    assert digest(backup) == digest(reference)
+
+
+def test_encrypted_round_trip(tmp_path, image):
+    if quickusbkit.AESGCM is None:
+        pytest.skip("cryptography is not installed")
+    backup = str(tmp_path / 'backup.imgz')
+    restored = str(tmp_path / 'restored.img')
+    ImageCopier(buffer_size=MB, compression='gzip', passphrase='correct horse').backup_compressed(image, backup)
+    with pytest.raises(USBKitError):
+        ImageCopier().restore_compressed(backup, restored)
+    with pytest.raises(USBKitError):
+        ImageCopier(passphrase='wrong').restore_compressed(backup, restored)
+    ImageCopier(passphrase='correct horse').restore_compressed(backup, restored)
+    assert digest(restored) == digest(image)
+
+
+def test_corrupted_chunk(tmp_path, image):
+    backup = str(tmp_path / 'backup.imgz')
+    ImageCopier(buffer_size=MB, compression='gzip').backup_compressed(image, backup)
+    data = bytearray(open(backup, 'rb').read())
+    # The random chunks are stored uncompressed; flip a byte in one
+    position = data.index(open(image, 'rb').read()[6 * MB:6 * MB + 64])
+    data[position + 100] ^= 0xff
+    with open(backup, 'wb') as f:
+        f.write(data)
+    with pytest.raises(USBKitError, match="Checksum mismatch"):
+        ImageCopier().restore_compressed(backup, str(tmp_path / 'restored.img'))
+    assert leftover_threads() == []
+
+
+def test_truncated_image(tmp_path, image):
+    backup = str(tmp_path / 'backup.imgz')
+    ImageCopier(buffer_size=MB, compression='gzip').backup_compressed(image, backup)
+    with open(backup, 'r+b') as f:
+        f.truncate(os.path.getsize(backup) // 2)
+    with pytest.raises(USBKitError):
+        ImageCopier().restore_compressed(backup, str(tmp_path / 'restored.img'))
+    assert leftover_threads() == []
+
+
+def test_ordered_parallel_map_keeps_order():
+    def slow_square(n):
+        time.sleep(0.001 * (n % 7))
+        return n * n
+    assert list(ordered_parallel_map(slow_square, range(200), 8, 16)) == [n * n for n in range(200)]
+    assert leftover_threads() == []
+
+
+def test_ordered_parallel_map_raises_first_error():
+    def fail_at_five(n):
+        if n == 5:
+            raise ValueError(n)
+        return n
+    with pytest.raises(ValueError):
+        list(ordered_parallel_map(fail_at_five, range(100), 4, 8))
+    assert leftover_threads() == []
+
+
+def run_with_timeout(function, timeout=10):
+    """Run function on a daemon thread; a hang fails the test instead of blocking pytest"""
+    outcome = []
+    
+    def target():
+        try:
+            outcome.append(function())
+        except Exception as e:
+            outcome.append(e)
+    
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), f"{function.__name__} hung"
+    return outcome[0]
+
+
+def test_ordered_parallel_map_stops_a_blocked_feeder():
+    """Items that block until stop is set (like read_plan waiting for a buffer) must not hang a cancel"""
+    stop = threading.Event()
+    cancel = threading.Event()
+    
+    def items():
+        yield 1
+        yield 2
+        # Nothing is freed any more: wait like read_plan does
+        while not stop.is_set():
+            time.sleep(0.05)
+    
+    def consume():
+        results = ordered_parallel_map(lambda n: n, items(), 2, 2, cancel, stop)
+        assert next(results) == 1
+        cancel.set()
+        return next(results)
+    
+    assert isinstance(run_with_timeout(consume), OperationCancelled)
+    assert stop.is_set()
+    assert leftover_threads() == []
+
+
+@pytest.mark.parametrize('workers, in_flight', [(1, 2), (4, 8)])
+def test_cancelled_backup_returns(tmp_path, image, workers, in_flight):
+    cancel = threading.Event()
+    
+    def on_progress(done, total, mbps, eta):
+        # A slow consumer: the feeder fills every buffer and waits for one
+        time.sleep(0.05)
+        if done >= 2 * MB:
+            cancel.set()
+    
+    copier = ImageCopier(buffer_size=MB, compression='gzip', workers=workers, in_flight=in_flight,
+                         cancel_event=cancel, on_progress=on_progress)
+    
+    def backup():
+        return copier.backup_compressed(image, str(tmp_path / 'backup.imgz'))
+    
+    assert isinstance(run_with_timeout(backup), OperationCancelled)
+    assert leftover_threads() == []
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from quickusbkit import enumerate_block_devices
+from fake_sysfs import add_disk, enumerate_args, write_mountinfo, write_udev
+
+
+@pytest.fixture
+def root(tmp_path):
+    add_disk(str(tmp_path), 'sda', 8, 0, usb=False, partitions=2, removable=False)
+    add_disk(str(tmp_path), 'sdb', 8, 16, partitions=2)
+    add_disk(str(tmp_path), 'sdc', 8, 32, vendor='Generic', model='Flash Disk', removable=False)
+    mountpoint = tmp_path / 'media' / 'USB STICK'
+    mountpoint.mkdir(parents=True)
+    write_mountinfo(str(tmp_path), [('8:1', '/', 'ext4'), ('8:17', str(mountpoint), 'vfat')])
+    write_udev(str(tmp_path), '8:18', ID_FS_TYPE='exfat')
+    return tmp_path
+
+
+def by_device(devices):
+    return {device['device']: device for device in devices}
+
+
+def test_only_usb_disks(root):
+    devices = by_device(enumerate_block_devices(**enumerate_args(str(root))))
+    assert sorted(devices) == ['/dev/sdb1', '/dev/sdb2', '/dev/sdc']
+
+
+def test_partitions(root):
+    devices = by_device(enumerate_block_devices(**enumerate_args(str(root))))
+    first, second = devices['/dev/sdb1'], devices['/dev/sdb2']
+    assert first['disk'] == second['disk'] == '/dev/sdb'
+    assert first['model'] == 'SanDisk Cruzer Blade'
+    assert first['removable'] and first['transport'] == 'usb'
+    assert first['dev_number'] == '8:17'
+    assert first['size'] == 30031872 // 2 * 512
+    assert first['logical_block_size'] == 512 and first['max_sectors_kb'] == 240
+
+
+def test_mounted_partition(root):
+    devices = by_device(enumerate_block_devices(**enumerate_args(str(root))))
+    mounted = devices['/dev/sdb1']
+    # The \040 escape in mountinfo is decoded
+    assert mounted['mountpoint'] == os.path.join(str(root), 'media', 'USB STICK')
+    assert mounted['fstype'] == 'vfat'
+    assert mounted['total'] > 0
+
+
+def test_unmounted_partition_uses_udev(root):
+    devices = by_device(enumerate_block_devices(**enumerate_args(str(root))))
+    assert devices['/dev/sdb2']['mountpoint'] == 'Not mounted'
+    assert devices['/dev/sdb2']['fstype'] == 'exfat'
+    assert devices['/dev/sdc']['fstype'] == 'Unknown'
+
+
+def test_whole_disk_without_partitions(root):
+    disk = by_device(enumerate_block_devices(**enumerate_args(str(root))))['/dev/sdc']
+    assert disk['disk'] == '/dev/sdc'
+    assert not disk['removable']
+    assert disk['model'] == 'Generic Flash Disk'
+
+
+def test_names(root):
+    devices = enumerate_block_devices(names=['sdc', 'sda'], **enumerate_args(str(root)))
+    assert [device['device'] for device in devices] == ['/dev/sdc']
+
+
+def test_missing_sysfs(tmp_path):
+    assert enumerate_block_devices(**enumerate_args(str(tmp_path))) == []
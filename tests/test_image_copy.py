@@ -0,0 +1,93 @@
+import hashlib
+import os
+
+import pytest
+
+from quickusbkit import SPARSE_BLOCK, ImageCopier, USBOperation, USBWorker, find_zero_runs
+
+MB = 1024 * 1024
+
+
+def digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(MB), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+@pytest.fixture
+def stick(tmp_path):
+    """A 24 MB + 3 KB image: random data, a zero gap and an unaligned tail"""
+    path = tmp_path / 'stick.img'
+    with open(path, 'wb') as f:
+        f.write(os.urandom(8 * MB))
+        f.write(bytes(8 * MB))
+        f.write(os.urandom(8 * MB + 3 * 1024))
+    return str(path)
+
+
+def run_worker(operation, params):
+    worker = USBWorker(operation, params)
+    finished = []
+    worker.finished.connect(finished.append)
+    worker.run()
+    assert len(finished) == 1
+    return finished[0]
+
+
+@pytest.mark.parametrize('buffer_size, buffers', [(MB, 2), (4 * MB, 3), (ImageCopier.DEFAULT_BUFFER_SIZE, 2)])
+def test_copy_round_trip(tmp_path, stick, buffer_size, buffers):
+    backup = str(tmp_path / 'backup.img')
+    restored = str(tmp_path / 'restored.img')
+    progress = []
+    
+    copier = ImageCopier(buffer_size=buffer_size, buffers=buffers,
+                         on_progress=lambda done, total, mbps, eta: progress.append(done))
+    assert copier.copy(stick, backup) == os.path.getsize(stick)
+    assert copier.bytes_skipped >= 8 * MB
+    assert progress[-1] == os.path.getsize(stick)
+    assert progress == sorted(progress)
+    
+    ImageCopier(buffer_size=buffer_size, buffers=buffers).copy(backup, restored)
+    assert os.path.getsize(restored) == os.path.getsize(stick)
+    assert digest(restored) == digest(stick)
+
+
+def test_copy_without_sparse(tmp_path, stick):
+    backup = str(tmp_path / 'backup.img')
+    copier = ImageCopier(sparse=False)
+    copier.copy(stick, backup)
+    assert copier.bytes_skipped == 0
+    assert digest(backup) == digest(stick)
+
+
+def test_copy_size_limit(tmp_path, stick):
+    backup = str(tmp_path / 'backup.img')
+    assert ImageCopier().copy(stick, backup, size=5 * MB) == 5 * MB
+    with open(stick, 'rb') as f:
+        assert open(backup, 'rb').read() == f.read(5 * MB)
+
+
+def test_worker_backup_restore(tmp_path, stick):
+    backup = str(tmp_path / 'backup.img')
+    restored = tmp_path / 'restored.img'
+    restored.write_bytes(b'old contents' * 1000)
+    
+    result = run_worker(USBOperation.BACKUP, {'device': stick, 'backup_file': backup, 'mode': 'full'})
+    assert result.startswith(f"Backup completed: {backup}")
+    result = run_worker(USBOperation.RESTORE, {'device': str(restored), 'backup_file': backup})
+    assert result.startswith(f"Backup restored successfully to {restored}")
+    assert digest(str(restored)) == digest(stick)
+
+
+def test_find_zero_runs():
+    block = SPARSE_BLOCK
+    buf = bytearray(os.urandom(16 * block + 100))
+    buf[block:3 * block] = bytes(2 * block)
+    # Partial zero block and a zero tail shorter than a block stay data
+    buf[5 * block:5 * block + block // 2] = bytes(block // 2)
+    buf[16 * block:] = bytes(100)
+    runs = find_zero_runs(buf, len(buf))
+    assert [run for run in runs if run[2]] == [(block, 3 * block, True)]
+    assert runs[0] == (0, block, False) and runs[-1] == (3 * block, 16 * block + 100, False)
@@ -0,0 +1,118 @@
+import pytest
+
+from quickusbkit import DeviceInventory
+
+
+class CountingEnumerator:
+    def __init__(self, *names):
+        self.names = list(names)
+        self.calls = 0
+    
+    def __call__(self):
+        self.calls += 1
+        return [{'device': name, 'disk': name.rstrip('0123456789')} for name in self.names]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def enumerator():
+    return CountingEnumerator('/dev/sdb1', '/dev/sdb2', '/dev/sdc1')
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def inventory(enumerator, clock):
+    return DeviceInventory(enumerator, ttls={'smart': 60, 'usage': 5}, clock=clock)
+
+
+def test_refresh_enumerates_once_until_invalidated(inventory, enumerator):
+    assert [device['device'] for device in inventory.refresh()] == ['/dev/sdb1', '/dev/sdb2', '/dev/sdc1']
+    inventory.refresh()
+    inventory.get_devices()
+    assert enumerator.calls == 1
+    
+    inventory.refresh(force=True)
+    assert enumerator.calls == 2
+    
+    inventory.invalidate()
+    inventory.get_devices()
+    assert enumerator.calls == 3
+    assert inventory.enumerations == 3
+
+
+def test_refresh_returns_a_copy(inventory):
+    inventory.refresh().clear()
+    assert len(inventory.get_devices()) == 3
+
+
+def test_find(inventory, enumerator):
+    # Nothing enumerated yet and no refresh allowed
+    assert inventory.find('/dev/sdb1', refresh=False) is None
+    assert enumerator.calls == 0
+    
+    assert inventory.find('/dev/sdb1')['disk'] == '/dev/sdb'
+    assert enumerator.calls == 1
+    
+    enumerator.names.append('/dev/sdd1')
+    inventory.invalidate()
+    # A stale snapshot is still served without refresh
+    assert inventory.find('/dev/sdd1', refresh=False) is None
+    assert enumerator.calls == 1
+    assert inventory.find('/dev/sdd1') is not None
+    assert enumerator.calls == 2
+
+
+def test_field_ttl(inventory, clock):
+    loads = []
+    
+    def loader():
+        loads.append(clock.now)
+        return len(loads)
+    
+    assert inventory.get_field('/dev/sdb1', 'smart', loader) == 1
+    clock.now += 59
+    assert inventory.get_field('/dev/sdb1', 'smart', loader) == 1
+    assert inventory.peek_field('/dev/sdb1', 'smart') == (1, True)
+    
+    clock.now += 1
+    assert inventory.peek_field('/dev/sdb1', 'smart') == (1, False)
+    assert inventory.get_field('/dev/sdb1', 'smart', loader) == 2
+    assert len(loads) == 2
+    
+    # Fields have their own TTLs, unknown ones are never fresh
+    assert inventory.get_field('/dev/sdb1', 'usage', loader) == 3
+    clock.now += 5
+    assert inventory.get_field('/dev/sdb1', 'usage', loader) == 4
+    assert inventory.get_field('/dev/sdb1', 'other', loader) == 5
+    assert inventory.get_field('/dev/sdb1', 'other', loader) == 6
+
+
+def test_invalidate_device_drops_its_partitions_only(inventory):
+    for device in ('/dev/sdb', '/dev/sdb1', '/dev/sdb2', '/dev/sdba1', '/dev/sdc1'):
+        inventory.set_field(device, 'smart', device)
+    
+    inventory.invalidate('/dev/sdb')
+    assert inventory.stale
+    assert sorted(device for device, _ in inventory.fields) == ['/dev/sdba1', '/dev/sdc1']
+
+
+def test_refresh_forgets_removed_devices(inventory, enumerator):
+    inventory.refresh()
+    inventory.set_field('/dev/sdb1', 'smart', 'ok')
+    inventory.set_field('/dev/sdc1', 'smart', 'ok')
+    
+    enumerator.names.remove('/dev/sdc1')
+    inventory.refresh(force=True)
+    assert inventory.peek_field('/dev/sdc1', 'smart') == (None, False)
+    assert inventory.peek_field('/dev/sdb1', 'smart') == ('ok', True)
@@ -0,0 +1,87 @@
+import hashlib
+import os
+
+import pytest
+
+from quickusbkit import BENCHMARK_PROFILES, BenchmarkEngine, BenchmarkTarget, USBOperation, USBWorker
+
+MB = 1024 * 1024
+
+
+def digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / 'stick.img'
+    with open(path, 'wb') as f:
+        f.write(os.urandom(48 * MB))
+    return str(path)
+
+
+def test_zone_offsets(image):
+    with BenchmarkTarget(image) as target:
+        engine = BenchmarkEngine(target, 4 * MB, random_span=target.size)
+        assert engine.zone_offset('start') == 0
+        assert engine.zone_offset(None) == 0
+        assert engine.zone_offset('middle') == 22 * MB
+        assert engine.zone_offset('end') == 44 * MB
+
+
+def test_raw_phases_read_only(image):
+    before = digest(image)
+    with BenchmarkTarget(image) as target:
+        assert not target.writable
+        engine = BenchmarkEngine(target, 4 * MB, random_span=target.size)
+        for phase in BENCHMARK_PROFILES['raw']['phases']:
+            assert phase.op == 'read'
+            result = engine.run_phase(phase)
+            assert result['bytes'] == (phase.amount or 4 * MB)
+            assert result['ops'] == result['bytes'] // phase.block_size
+            assert result['mbps'] > 0
+            assert result['latency'].count == result['ops']
+    assert digest(image) == before
+
+
+def test_raw_zone_reads_stay_in_zone(image):
+    reads = []
+    
+    class RecordingTarget(BenchmarkTarget):
+        def read(self, buf, offset):
+            reads.append(offset)
+            return super().read(buf, offset)
+    
+    with RecordingTarget(image) as target:
+        engine = BenchmarkEngine(target, 4 * MB, random_span=target.size)
+        for phase in BENCHMARK_PROFILES['raw']['phases'][:3]:
+            reads.clear()
+            engine.run_phase(phase)
+            base = engine.zone_offset(phase.zone)
+            assert sorted(reads) == list(range(base, base + 4 * MB, MB))
+
+
+def test_worker_raw_profile(image):
+    before = digest(image)
+    worker = USBWorker(USBOperation.BENCHMARK, {'device': image, 'profile': 'raw', 'zone_size_mb': 4})
+    finished = []
+    worker.finished.connect(finished.append)
+    worker.run()
+    
+    assert len(finished) == 1
+    assert finished[0].startswith(f"Benchmark Results ({image}")
+    assert "Read-only test, nothing was written" in finished[0]
+    assert set(worker.results) == {(phase.name, 'read') for phase in BENCHMARK_PROFILES['raw']['phases']}
+    assert all(result['bytes'] for result in worker.results.values())
+    assert digest(image) == before
+
+
+def test_worker_raw_profile_too_small(tmp_path):
+    path = tmp_path / 'tiny.img'
+    path.write_bytes(bytes(2 * MB))
+    worker = USBWorker(USBOperation.BENCHMARK, {'device': str(path), 'profile': 'raw'})
+    finished = []
+    worker.finished.connect(finished.append)
+    worker.run()
+    assert finished == [f"Error: Device {path} is too small to benchmark"]
@@ -0,0 +1,48 @@
+import json
+from datetime import datetime, timedelta
+
+import quickusbkit
+
+
+def write(path, schedules):
+    path.write_text(json.dumps(schedules))
+
+
+def test_legacy_schedules_are_stamped_and_saved(tmp_path):
+    path = tmp_path / "schedules.json"
+    write(path, [{'disk': '/dev/sdb', 'schedule': "Weekly", 'hour': 0, 'minute': 0}])
+    
+    before = datetime.now().replace(microsecond=0)
+    schedules = quickusbkit.load_schedules(str(path))
+    schedule = schedules[0]
+    created = datetime.fromisoformat(schedule['created'])
+    assert before <= created <= datetime.now()
+    assert schedule['weekday'] == created.weekday()
+    assert schedule['day'] == created.day
+    assert json.loads(path.read_text()) == schedules
+
+
+def test_legacy_schedules_are_not_due_until_the_next_slot(tmp_path):
+    path = tmp_path / "schedules.json"
+    write(path, [{'disk': '/dev/sdb', 'schedule': kind, 'hour': 0, 'minute': 0}
+                 for kind in ("Daily", "Weekly", "Monthly")])
+    
+    schedules = quickusbkit.load_schedules(str(path))
+    now = datetime.now()
+    assert not any(quickusbkit.backup_due(schedule, now) for schedule in schedules)
+    assert all(quickusbkit.backup_due(schedule, now + timedelta(days=32)) for schedule in schedules)
+
+
+def test_current_schedules_are_left_alone(tmp_path):
+    path = tmp_path / "schedules.json"
+    schedule = {'disk': '/dev/sdb', 'schedule': "Monthly", 'hour': 3, 'minute': 0,
+                'weekday': 2, 'day': 31, 'created': "2024-01-10T09:00:00", 'last_run': None}
+    write(path, [schedule])
+    mtime = path.stat().st_mtime_ns
+    
+    assert quickusbkit.load_schedules(str(path)) == [schedule]
+    assert path.stat().st_mtime_ns == mtime
+
+
+def test_missing_schedules_file(tmp_path):
+    assert quickusbkit.load_schedules(str(tmp_path / "schedules.json")) == []
@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+
+import pytest
+
+import quickusbkit
+from quickusbkit import CommandResult, SmartCache, SmartReport
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'smartctl')
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, f"{name}.json")) as f:
+        return f.read()
+
+
+class FakeSmartctl:
+    """Stands in for COMMAND_RUNNER.run, answering smartctl with a fixture per device"""
+    
+    def __init__(self, outputs, delay=0.0):
+        self.outputs = outputs
+        self.delay = delay
+        self.calls = []
+    
+    def __call__(self, args, input=None, timeout=None, check=False, on_stdout=None, on_stderr=None):
+        self.calls.append(args)
+        time.sleep(self.delay)
+        output = self.outputs[args[-1]]
+        if isinstance(output, Exception):
+            raise output
+        return CommandResult(list(args), 0, output, '', self.delay)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def cache(clock):
+    return SmartCache(ttl=60, clock=clock)
+
+
+def stub(monkeypatch, outputs, delay=0.0):
+    smartctl = FakeSmartctl(outputs, delay)
+    monkeypatch.setattr(quickusbkit.COMMAND_RUNNER, 'run', smartctl)
+    return smartctl
+
+
+def test_ata_report():
+    report = SmartReport.from_json(fixture('ata'), '/dev/sdb')
+    assert report.usable and not report.in_standby
+    assert report.model == 'Samsung SSD 870 EVO 500GB'
+    assert report.health_status == 'PASSED'
+    assert report.temperature == 34
+    assert report.power_on_hours == 1234
+    assert report.error_count == 0
+    assert report.attributes['Reallocated_Sector_Ct'].raw == 0
+    assert report.find_attribute('Wear_Leveling').value == 98
+    assert report.find_attribute('Missing') is None
+
+
+def test_nvme_report():
+    report = SmartReport.from_json(fixture('nvme'))
+    assert report.usable
+    assert report.attributes == {}
+    assert report.temperature == 41
+    assert report.power_on_hours == 812
+    assert report.error_count == 3
+
+
+def test_standby_report():
+    report = SmartReport.from_json(fixture('standby'))
+    assert not report.usable
+    assert report.in_standby
+    assert report.health_status == 'Unknown'
+
+
+def test_unusable_report():
+    report = SmartReport.from_json(fixture('unusable'))
+    assert not report.usable
+    assert not report.in_standby
+
+
+def test_concurrent_get_spawns_once(monkeypatch, cache):
+    smartctl = stub(monkeypatch, {'/dev/sdzz': fixture('ata')}, delay=0.1)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('/dev/sdzz1'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert cache.spawns == 1
+    assert len(smartctl.calls) == 1
+    assert smartctl.calls[0] == ['smartctl', '-a', '-j', '/dev/sdzz']
+    assert len(results) == 8 and all(report is results[0] for report in results)
+
+
+def test_devices_are_probed_separately(monkeypatch, cache):
+    stub(monkeypatch, {'/dev/sdzy': fixture('ata'), '/dev/sdzz': fixture('nvme')})
+    assert cache.get('/dev/sdzy').model != cache.get('/dev/sdzz').model
+    cache.get('/dev/sdzy1')
+    cache.get('/dev/sdzz')
+    assert cache.spawns == 2
+
+
+def test_ttl_and_invalidate(monkeypatch, cache, clock):
+    stub(monkeypatch, {'/dev/sdzz': fixture('ata')})
+    cache.get('/dev/sdzz')
+    clock.now += 59
+    cache.get('/dev/sdzz')
+    assert cache.spawns == 1
+    clock.now += 1
+    cache.get('/dev/sdzz')
+    assert cache.spawns == 2
+    cache.invalidate('/dev/sdzz1')
+    cache.get('/dev/sdzz')
+    assert cache.spawns == 3
+
+
+def test_unusable_is_cached(monkeypatch, cache, clock):
+    stub(monkeypatch, {'/dev/sdzz': fixture('unusable')})
+    threads = [threading.Thread(target=cache.get, args=('/dev/sdzz',)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.get('/dev/sdzz') is None
+    assert cache.spawns == 1
+    clock.now += 60
+    cache.get('/dev/sdzz')
+    assert cache.spawns == 2
+
+
+def test_missing_smartctl_is_cached(monkeypatch, cache):
+    stub(monkeypatch, {'/dev/sdzz': FileNotFoundError('smartctl')})
+    assert cache.get('/dev/sdzz') is None
+    assert cache.get('/dev/sdzz') is None
+    assert cache.spawns == 1
+
+
+def test_standby(monkeypatch, cache):
+    smartctl = stub(monkeypatch, {'/dev/sdzz': fixture('standby')})
+    assert cache.get('/dev/sdzz', wake=False) is None
+    assert cache.get('/dev/sdzz', wake=False) is None
+    assert cache.is_standby('/dev/sdzz1')
+    assert cache.spawns == 1
+    assert smartctl.calls[0] == ['smartctl', '-a', '-j', '-n', 'standby', '/dev/sdzz']
+    
+    # A caller allowed to wake the device probes it again
+    smartctl.outputs['/dev/sdzz'] = fixture('ata')
+    assert cache.get('/dev/sdzz').usable
+    assert cache.spawns == 2
+    assert not cache.is_standby('/dev/sdzz')
+
+
+def test_cached_fallback(cache, clock):
+    probes = []
+    for _ in range(3):
+        cache.cached_fallback('/dev/sdzz1', 'hddtemp', lambda: probes.append(1) or 40)
+    assert probes == [1]
+    clock.now += 60
+    assert cache.cached_fallback('/dev/sdzz', 'hddtemp', lambda: probes.append(1) or 41) == 41
+    assert len(probes) == 2
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import random
+import shutil
+import subprocess
+
+import pytest
+
+from quickusbkit import ImageCopier, data_extents, discard_zeroes_data
+
+MB = 1024 * 1024
+SIZE = 64 * MB
+# (offset, length) of the data written into the otherwise empty image
+EXTENTS = [(0, MB), (10 * MB, 3 * MB + 4096), (40 * MB + 65536, 2 * MB), (SIZE - MB, MB)]
+
+
+def digest(path, size=SIZE):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        h.update(f.read(size))
+    return h.hexdigest()
+
+
+def allocated(path):
+    return os.stat(path).st_blocks * 512
+
+
+@pytest.fixture
+def sparse_image(tmp_path):
+    path = str(tmp_path / 'sparse.img')
+    with open(path, 'wb') as f:
+        f.truncate(SIZE)
+        for offset, length in EXTENTS:
+            f.seek(offset)
+            f.write(os.urandom(length))
+    if allocated(path) >= SIZE:
+        pytest.skip("the temporary directory does not support sparse files")
+    return path
+
+
+@pytest.fixture
+def loop_device(tmp_path):
+    if os.geteuid() != 0 or not shutil.which('losetup'):
+        pytest.skip("needs root and losetup")
+    backing = tmp_path / 'loop.img'
+    with open(backing, 'wb') as f:
+        f.write(os.urandom(SIZE))
+    result = subprocess.run(['losetup', '--find', '--show', str(backing)], capture_output=True, text=True)
+    if result.returncode != 0:
+        pytest.skip(f"no loop device: {result.stderr.strip()}")
+    device = result.stdout.strip()
+    yield device
+    subprocess.run(['losetup', '-d', device])
+
+
+def test_data_extents(sparse_image):
+    fd = os.open(sparse_image, os.O_RDONLY)
+    try:
+        extents = list(data_extents(fd, SIZE))
+    finally:
+        os.close(fd)
+    assert sum(length for _, length, _ in extents) == SIZE
+    data = [(offset, length) for offset, length, is_data in extents if is_data]
+    # Filesystems report data in their own block granularity
+    for offset, length in EXTENTS:
+        assert any(start <= offset and offset + length <= start + size for start, size in data)
+    assert sum(length for _, length in data) < SIZE // 4
+
+
+def test_copy_keeps_holes(tmp_path, sparse_image):
+    backup = str(tmp_path / 'backup.img')
+    copier = ImageCopier()
+    assert copier.copy(sparse_image, backup) == SIZE
+    assert os.path.getsize(backup) == SIZE
+    assert copier.bytes_written == sum(length for _, length in EXTENTS)
+    assert allocated(backup) <= allocated(sparse_image) + MB
+    assert digest(backup) == digest(sparse_image)
+
+
+def test_zero_blocks_become_holes(tmp_path):
+    source = str(tmp_path / 'dense.img')
+    with open(source, 'wb') as f:
+        f.write(os.urandom(MB) + bytes(30 * MB) + os.urandom(MB))
+    backup = str(tmp_path / 'backup.img')
+    ImageCopier().copy(source, backup)
+    assert allocated(backup) < 8 * MB
+    assert digest(backup, 32 * MB) == digest(source, 32 * MB)
+
+
+def test_restore_round_trip(tmp_path, sparse_image):
+    backup = str(tmp_path / 'backup.img')
+    restored = str(tmp_path / 'restored.img')
+    ImageCopier().copy(sparse_image, backup)
+    with open(restored, 'wb') as f:
+        f.write(os.urandom(SIZE))
+    ImageCopier().copy(backup, restored)
+    assert os.path.getsize(restored) == SIZE
+    assert allocated(restored) < SIZE // 2
+    assert digest(restored) == digest(sparse_image)
+
+
+@pytest.mark.parametrize('holes', ['zero', 'discard'])
+def test_restore_to_device(tmp_path, sparse_image, loop_device, holes):
+    backup = str(tmp_path / 'backup.img')
+    ImageCopier().copy(sparse_image, backup)
+    copier = ImageCopier(holes=holes)
+    copier.copy(backup, loop_device)
+    # A full image restore never leaves old data behind, discard or not
+    assert digest(loop_device) == digest(sparse_image)
+
+
+def test_restore_to_device_skip(tmp_path, sparse_image, loop_device):
+    backup = str(tmp_path / 'backup.img')
+    ImageCopier().copy(sparse_image, backup)
+    with open(loop_device, 'rb') as f:
+        old = f.read(SIZE)
+    ImageCopier(holes='skip').copy(backup, loop_device)
+    with open(loop_device, 'rb') as f, open(sparse_image, 'rb') as image:
+        restored, expected = f.read(SIZE), image.read()
+    for offset, length in EXTENTS:
+        assert restored[offset:offset + length] == expected[offset:offset + length]
+    # Old contents stay where the image is empty
+    offset = random.randrange(20 * MB, 40 * MB)
+    assert restored[offset:offset + 4096] == old[offset:offset + 4096]
+
+
+def test_discard_zeroes_data_missing_device(tmp_path):
+    assert not discard_zeroes_data(str(tmp_path / 'missing'))
+    assert not discard_zeroes_data(__file__)
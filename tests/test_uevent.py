@@ -0,0 +1,94 @@
+import struct
+
+import pytest
+
+from quickusbkit import UeventMonitor, is_same_device, parse_uevent
+
+
+def kernel_message(action, devpath, **properties):
+    """A datagram as the kernel sends it: "action@devpath" then KEY=value fields"""
+    fields = {'ACTION': action, 'DEVPATH': devpath}
+    fields.update(properties)
+    parts = [f"{action}@{devpath}"] + [f"{key}={value}" for key, value in fields.items()]
+    return '\0'.join(parts).encode() + b'\0'
+
+
+def libudev_message(action, devpath, **properties):
+    """A datagram re-broadcast by udev: binary "libudev" header, then the properties"""
+    body = '\0'.join(f"{key}={value}" for key, value in
+                     dict(ACTION=action, DEVPATH=devpath, **properties).items()).encode() + b'\0'
+    header = b'libudev\0' + struct.pack('!IIIIIIII', 0xfeedcafe, 40, 40, 40, len(body), 0, 0, 0)
+    return header + body
+
+
+DISK = '/devices/pci0000:00/0000:00:14.0/usb2/2-1/2-1:1.0/host6/target6:0:0/6:0:0:0/block/sdb'
+
+
+@pytest.fixture
+def monitor():
+    monitor = UeventMonitor()
+    events = []
+    monitor.device_event.connect(lambda action, properties: events.append((action, properties)))
+    monitor.events = events
+    return monitor
+
+
+def test_parse_kernel_add():
+    action, properties = parse_uevent(kernel_message(
+        'add', DISK, SUBSYSTEM='block', DEVNAME='sdb', DEVTYPE='disk', SEQNUM='4242'))
+    assert action == 'add'
+    assert properties['DEVNAME'] == 'sdb'
+    assert properties['DEVTYPE'] == 'disk'
+    assert properties['DEVPATH'] == DISK
+
+
+def test_parse_header_only_fills_action_and_devpath():
+    action, properties = parse_uevent(f"remove@{DISK}/sdb1".encode() + b'\0SUBSYSTEM=block\0')
+    assert action == 'remove'
+    assert properties['DEVPATH'] == f"{DISK}/sdb1"
+
+
+def test_parse_ignores_libudev():
+    assert parse_uevent(libudev_message('add', DISK, SUBSYSTEM='block', DEVNAME='sdb')) is None
+
+
+def test_parse_value_with_equals_sign():
+    _, properties = parse_uevent(kernel_message('change', DISK, SUBSYSTEM='block', ID_FS_LABEL='a=b'))
+    assert properties['ID_FS_LABEL'] == 'a=b'
+
+
+def test_handle_disk_and_partitions(monitor):
+    messages = [kernel_message('add', DISK, SUBSYSTEM='block', DEVNAME='sdb', DEVTYPE='disk')]
+    messages += [kernel_message('add', f"{DISK}/sdb{n}", SUBSYSTEM='block', DEVNAME=f"sdb{n}",
+                                DEVTYPE='partition', PARTN=str(n)) for n in (1, 2)]
+    messages += [kernel_message('remove', f"{DISK}/sdb{n}", SUBSYSTEM='block', DEVNAME=f"sdb{n}",
+                                DEVTYPE='partition') for n in (1, 2)]
+    messages.append(kernel_message('remove', DISK, SUBSYSTEM='block', DEVNAME='sdb', DEVTYPE='disk'))
+    
+    assert all(monitor.handle_message(message) for message in messages)
+    assert [(action, properties['DEVNAME']) for action, properties in monitor.events] == [
+        ('add', 'sdb'), ('add', 'sdb1'), ('add', 'sdb2'),
+        ('remove', 'sdb1'), ('remove', 'sdb2'), ('remove', 'sdb')]
+
+
+def test_handle_skips_other_subsystems(monitor):
+    usb = '/devices/pci0000:00/0000:00:14.0/usb2/2-1'
+    assert not monitor.handle_message(kernel_message('add', usb, SUBSYSTEM='usb', DEVTYPE='usb_device'))
+    assert not monitor.handle_message(libudev_message('add', DISK, SUBSYSTEM='block', DEVNAME='sdb'))
+    assert monitor.events == []
+
+
+@pytest.mark.parametrize('device, disk, expected', [
+    ('/dev/sdb', '/dev/sdb', True),
+    ('/dev/sdb1', '/dev/sdb', True),
+    ('/dev/sdb12', '/dev/sdb', True),
+    ('/dev/sdba', '/dev/sdb', False),
+    ('/dev/sdba1', '/dev/sdb', False),
+    ('/dev/sdc1', '/dev/sdb', False),
+    ('/dev/mmcblk0p1', '/dev/mmcblk0', True),
+    ('/dev/mmcblk01', '/dev/mmcblk0', False),
+    ('/dev/nvme0n1p2', '/dev/nvme0n1', True),
+    ('/dev/nvme0n12', '/dev/nvme0n1', False),
+])
+def test_is_same_device(device, disk, expected):
+    assert is_same_device(device, disk) is expected
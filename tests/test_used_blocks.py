@@ -0,0 +1,185 @@
+import hashlib
+import os
+import shutil
+import struct
+import subprocess
+
+import pytest
+
+from quickusbkit import ImageCopier, USBKitError, read_used_image_header, used_block_layout
+
+MB = 1024 * 1024
+SIZE = 128 * MB
+
+# detect_filesystem name -> mkfs command line (the image path is appended)
+MKFS = {
+    'fat': ['mkfs.vfat', '-F', '32'],
+    'exfat': ['mkfs.exfat'],
+    'ext4': ['mkfs.ext4', '-q', '-F'],
+    'ntfs': ['mkfs.ntfs', '-q', '-F', '-Q'],
+}
+
+
+def digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def run(args):
+    subprocess.run(args, check=True, capture_output=True)
+
+
+def make_filesystem(path, fstype):
+    if not shutil.which(MKFS[fstype][0]):
+        pytest.skip(f"{MKFS[fstype][0]} is not installed")
+    with open(path, 'wb') as f:
+        f.truncate(SIZE)
+    run(MKFS[fstype] + [path])
+
+
+def attach(path):
+    return subprocess.run(['losetup', '--find', '--show', path], check=True,
+                          capture_output=True, text=True).stdout.strip()
+
+
+def detach(device):
+    subprocess.run(['losetup', '-d', device])
+
+
+def needs_root():
+    if os.geteuid() != 0 or not shutil.which('losetup'):
+        pytest.skip("needs root, losetup and mount")
+
+
+def populate(mountpoint):
+    """Write files of known contents, fragmenting free space on the way; returns their digests"""
+    files = {}
+    os.makedirs(os.path.join(mountpoint, 'dir', 'sub'))
+    for index in range(24):
+        with open(os.path.join(mountpoint, 'dir', f"small{index}"), 'wb') as f:
+            f.write(os.urandom(64 * 1024 + index * 4097))
+    for index in range(0, 24, 2):
+        os.unlink(os.path.join(mountpoint, 'dir', f"small{index}"))
+    with open(os.path.join(mountpoint, 'dir', 'sub', 'large'), 'wb') as f:
+        for _ in range(12):
+            f.write(os.urandom(MB))
+    with open(os.path.join(mountpoint, 'tiny.txt'), 'w') as f:
+        f.write("hello\n")
+    for root, _, names in os.walk(mountpoint):
+        for name in names:
+            path = os.path.join(root, name)
+            files[os.path.relpath(path, mountpoint)] = digest(path)
+    return files
+
+
+def mounted_files(mountpoint):
+    return {os.path.relpath(os.path.join(root, name), mountpoint): digest(os.path.join(root, name))
+            for root, _, names in os.walk(mountpoint) for name in names}
+
+
+def check_extents(description, size, extents):
+    assert size == SIZE
+    assert extents == sorted(extents)
+    for (start, length), (next_start, _) in zip(extents, extents[1:]):
+        assert start + length < next_start
+    assert extents[0][0] == 0 and extents[-1][0] + extents[-1][1] == SIZE
+
+
+@pytest.mark.parametrize('fstype', sorted(MKFS))
+def test_empty_filesystem(tmp_path, fstype):
+    image = str(tmp_path / 'fs.img')
+    make_filesystem(image, fstype)
+    description, size, extents = used_block_layout(image)
+    assert description == fstype
+    check_extents(description, size, extents)
+    assert sum(length for _, length in extents) < SIZE // 4
+
+
+@pytest.mark.parametrize('fstype', sorted(MKFS))
+def test_used_extents_cover_files(tmp_path, fstype):
+    image = str(tmp_path / 'fs.img')
+    make_filesystem(image, fstype)
+    needs_root()
+    mountpoint = str(tmp_path / 'mnt')
+    os.mkdir(mountpoint)
+    run(['mount', '-o', 'loop', image, mountpoint])
+    try:
+        files = populate(mountpoint)
+    finally:
+        run(['umount', mountpoint])
+    
+    description, size, extents = used_block_layout(image)
+    check_extents(description, size, extents)
+    used = sum(length for _, length in extents)
+    assert used >= 18 * MB and used < SIZE // 2
+    
+    backup = str(tmp_path / 'used.img')
+    read, layout = ImageCopier().backup_used(image, backup)
+    assert read == used and layout == description
+    fd = os.open(backup, os.O_RDONLY)
+    try:
+        header, _ = read_used_image_header(fd)
+    finally:
+        os.close(fd)
+    assert [tuple(extent) for extent in header['extents']] == extents
+    
+    # Restore onto random data, leaving it between the extents: anything the
+    # filesystem needs outside the extents would show up as corruption
+    target = tmp_path / 'target.img'
+    target.write_bytes(os.urandom(SIZE))
+    device = attach(str(target))
+    try:
+        ImageCopier(holes='skip').restore_used(backup, device)
+        if fstype == 'ext4':
+            run(['e2fsck', '-fn', device])
+        run(['mount', '-o', 'ro', device, mountpoint])
+        try:
+            assert mounted_files(mountpoint) == files
+        finally:
+            run(['umount', mountpoint])
+    finally:
+        detach(device)
+
+
+def write_mbr(path, partitions):
+    """partitions: list of (type, first sector, sectors)"""
+    entries = b''.join(struct.pack('<B3sB3sII', 0, b'\0\0\0', kind, b'\0\0\0', first, count)
+                       for kind, first, count in partitions)
+    with open(path, 'r+b') as f:
+        f.seek(446)
+        f.write(entries.ljust(64, b'\0') + b'\x55\xaa')
+
+
+def test_partitioned_image(tmp_path):
+    if not shutil.which('mke2fs'):
+        pytest.skip("mke2fs is not installed")
+    source = tmp_path / 'files'
+    source.mkdir()
+    (source / 'data').write_bytes(os.urandom(3 * MB))
+    image = str(tmp_path / 'disk.img')
+    with open(image, 'wb') as f:
+        f.truncate(SIZE)
+        # An unknown partition is kept whole
+        f.seek(80 * MB)
+        f.write(os.urandom(MB))
+    run(['mke2fs', '-q', '-t', 'ext4', '-F', '-E', f"offset={MB}", '-d', str(source), image, f"{60 * 1024}k"])
+    write_mbr(image, [(0x83, 2048, 60 * 2048), (0xda, 64 * 2048, 32 * 2048)])
+    
+    description, size, extents = used_block_layout(image)
+    assert description == 'mbr: ext4, unknown'
+    check_extents(description, size, extents)
+    assert any(start <= 64 * MB and 96 * MB <= start + length for start, length in extents)
+    assert sum(length for _, length in extents) < 48 * MB
+    
+    backup = str(tmp_path / 'used.img')
+    restored = str(tmp_path / 'restored.img')
+    ImageCopier().backup_used(image, backup)
+    ImageCopier().restore_used(backup, restored)
+    assert digest(restored) == digest(image)
+
+
+def test_unknown_image(tmp_path):
+    image = tmp_path / 'random.img'
+    image.write_bytes(os.urandom(4 * MB))
+    with pytest.raises(USBKitError):
+        used_block_layout(str(image))